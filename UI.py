@@ -1,16 +1,62 @@
 import os
+import time
+import atexit
+from contextlib import asynccontextmanager
 import httpx
 import gradio as gr
 
 API = os.getenv("API", "http://backend:8000")
 
+# Shared clients so every call reuses pooled keep-alive connections to the backend.
+# Streaming gets its own pool so a long-running /chat never holds a slot needed by short calls.
+# HTTP/2 is negotiated via TLS ALPN, so it only kicks in when API is an https endpoint
+# fronted by an h2-capable proxy; plain http:// keeps using HTTP/1.1.
+POOL_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+CLIENT = httpx.Client(base_url=API, timeout=10.0, limits=POOL_LIMITS, http2=True)
+# The streaming client is async so one long reply does not hold a Gradio worker thread.
+STREAM_CLIENT = httpx.AsyncClient(base_url=API, timeout=None, limits=POOL_LIMITS, http2=True)
+atexit.register(CLIENT.close)
+
+
+# The async client's connections belong to Gradio's event loop, so close it from
+# the server's lifespan shutdown rather than atexit
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await STREAM_CLIENT.aclose()
+
+
+# Minimum interval between Chatbot re-renders while streaming (seconds)
+STREAM_FLUSH_INTERVAL = 0.032
+
+# Short-lived cache for the /sessions list; bumping the version invalidates it
+SESSIONS_TTL = 2.0
+_sessions_version = 0
+_sessions_cache = {"version": -1, "expiry": 0.0, "sessions": None}
+
+
+def invalidate_sessions_cache():
+    global _sessions_version
+    _sessions_version += 1
+
 
 # ---------- API Caller Functions ----------
 def get_available_sessions():
+    cached = _sessions_cache
+    if cached["version"] == _sessions_version and time.monotonic() < cached["expiry"]:
+        return list(cached["sessions"])
+
     try:
-        response = httpx.get(f"{API}/sessions", timeout=5.0)
-        if response.status_code == 200 and "sessions" in response.json():
-            sessions_list = response.json()["sessions"]
+        version = _sessions_version
+        response = CLIENT.get("/sessions", timeout=5.0)
+        data = response.json()
+        if response.status_code == 200 and "sessions" in data:
+            sessions_list = data["sessions"]
+            _sessions_cache.update(
+                version=version,
+                expiry=time.monotonic() + SESSIONS_TTL,
+                sessions=list(sessions_list),
+            )
             return sessions_list
     except Exception:
         pass
@@ -18,22 +64,33 @@ def get_available_sessions():
 
 
 def create_session():
-    response = httpx.post(f"{API}/session", timeout=10.0)
+    response = CLIENT.post("/session")
     response.raise_for_status()
+    invalidate_sessions_cache()
     session_id = response.json()["session_id"]
     return session_id
 
 
-def get_streaming_response(session_id: str, user_message: str):
+async def get_streaming_response(session_id: str, user_message: str):
     payload = {"session_id": (session_id or "default"), "user_message": user_message}
     try:
-        with httpx.Client(timeout=None) as client:
-            with client.stream("POST", f"{API}/chat", json=payload) as response:
-                response.raise_for_status()
-                combined = ""
-                for chunk in response.iter_text():
-                    combined += chunk
-                    yield combined
+        async with STREAM_CLIENT.stream("POST", "/chat", json=payload) as response:
+            response.raise_for_status()
+            # Collect deltas in a list and only join when flushing, instead of
+            # re-copying the whole prefix for every token
+            parts = []
+            pending = False
+            last_flush = 0.0
+            async for chunk in response.aiter_text():
+                parts.append(chunk)
+                pending = True
+                now = time.monotonic()
+                if now - last_flush >= STREAM_FLUSH_INTERVAL:
+                    last_flush = now
+                    pending = False
+                    yield "".join(parts)
+            if pending:
+                yield "".join(parts)
     except httpx.HTTPStatusError as e:
         error_message = f"[ERROR] Backend returned {e.response.status_code}: {e.response.text}"
         yield error_message
@@ -44,36 +101,52 @@ def get_streaming_response(session_id: str, user_message: str):
 # ---------- Gradio Helper Functions ----------
 def init_sessions():
     sessions = get_available_sessions()
+    empty_sessions = []
     if not sessions:
         new_session_id = create_session()
         sessions = [new_session_id]
+        empty_sessions = [new_session_id]
     first_session_id = sessions[0]
-    return gr.update(choices=sessions, value=first_session_id), sessions, gr.update(value=[]), ""
+    return gr.update(choices=sessions, value=first_session_id), sessions, empty_sessions, gr.update(value=[]), ""
 
 
-def handle_new_chat_click(current_choices):
+def handle_new_chat_click(current_choices, empty_sessions):
     new_session_id = create_session()
-    sessions = get_available_sessions()
+    # The dropdown choices are already held in state, so no need to refetch /sessions
+    sessions = list(current_choices or [])
     if new_session_id not in sessions:
         sessions.append(new_session_id)
-    return gr.update(choices=sessions, value=new_session_id), sessions, gr.update(value=[]), f"Created: {new_session_id}"
+    # A brand-new session has no history, so switching to it can skip the history request
+    empty_sessions = list(empty_sessions or []) + [new_session_id]
+    return (
+        gr.update(choices=sessions, value=new_session_id),
+        sessions,
+        empty_sessions,
+        gr.update(value=[]),
+        f"Created: {new_session_id}"
+    )
 
 
-def handle_message_send(current_session_id, user_msg, chat_history):
+async def handle_message_send(current_session_id, user_msg, chat_history, empty_sessions):
     current_session_id = (current_session_id or "default").strip()
     user_msg = (user_msg or "").strip()
     if not user_msg:
-        yield gr.update()
+        yield gr.update(), gr.update()
         return
 
+    # The session is about to have history
+    empty_sessions = [s for s in (empty_sessions or []) if s != current_session_id]
+
     # Add user bubble
     chat_history = (chat_history or []) + [[user_msg, ""]]
+    # Publish the updated state before streaming, in case the reply body is empty
+    yield chat_history, empty_sessions
 
     # Stream assistant text and update last bubble
-    for partial_response in get_streaming_response(current_session_id, user_msg):
+    async for partial_response in get_streaming_response(current_session_id, user_msg):
         full_response = partial_response
         chat_history[-1][1] = full_response
-        yield chat_history
+        yield chat_history, empty_sessions
 
 
 # ---- fetch and map history for a session ----
@@ -83,27 +156,24 @@ def load_chat_history(session_id: str):
         return []
 
     try:
-        response = httpx.get(f"{API}/session/{session_id}/history", timeout=10.0)
+        response = CLIENT.get(f"/session/{session_id}/history")
         response.raise_for_status()
         data = response.json()
         msgs = data.get("messages", [])
 
-        # Convert messages to chat pairs [user_msg, assistant_msg]
+        # Convert messages to chat pairs [user_msg, assistant_msg] in a single pass
         chat_pairs = []
+        append_pair = chat_pairs.append
         last_user = None
-        for m in msgs:
-            role = m.get("role")
-            content = m.get("content", "")
+        for role, content in ((m["role"], m["content"]) for m in msgs):
             if role == "user":
                 last_user = content
             elif role == "assistant":
-                chat_pairs.append([last_user or "", content])
+                append_pair([last_user or "", content])
                 last_user = None
-            else:
-                pass
 
         if last_user is not None:
-            chat_pairs.append([last_user, ""])
+            append_pair([last_user, ""])
 
         return chat_pairs
 
@@ -112,7 +182,10 @@ def load_chat_history(session_id: str):
 
 
 # ----- Loads the selected session's history into the Chatbot. -----
-def handle_session_change(selected_session_id, current_history):
+def handle_session_change(selected_session_id, current_history, empty_sessions):
+    if selected_session_id in (empty_sessions or []):
+        return gr.update(value=[]), f"No history for session {selected_session_id}."
+
     chat_history_pairs = load_chat_history(selected_session_id)
 
     if chat_history_pairs:
@@ -122,23 +195,26 @@ def handle_session_change(selected_session_id, current_history):
     return gr.update(value=chat_history_pairs), status
 
 
-def handle_session_deletion(current_session_id, current_choices):
+def handle_session_deletion(current_session_id, current_choices, empty_sessions):
     session_to_be_deleted = (current_session_id or "").strip()
     choices = list(current_choices or [])
+    empty_sessions = list(empty_sessions or [])
 
     if not session_to_be_deleted:
-        return gr.update(), gr.update(), choices, "Select a session first."
+        return gr.update(), gr.update(), choices, empty_sessions, "Select a session first."
 
-    delete_url = f"{API}/session/{session_to_be_deleted}"
-    response = httpx.delete(delete_url, timeout=15.0)
+    response = CLIENT.delete(f"/session/{session_to_be_deleted}", timeout=15.0)
+    invalidate_sessions_cache()
 
     # Remove from dropdown list locally
     choices = [c for c in choices if c != session_to_be_deleted]
+    empty_sessions = [s for s in empty_sessions if s != session_to_be_deleted]
 
     # Create a new chat session if there is no existing chat session after deletion
     if not choices:
         new_sid = create_session()
         choices = [new_sid]
+        empty_sessions.append(new_sid)
         new_value = new_sid
         status = "Deleted. Started a new chat."
     else:
@@ -152,6 +228,7 @@ def handle_session_deletion(current_session_id, current_choices):
         gr.update(value=[], visible=True),
         gr.update(choices=choices, value=new_value),
         choices,
+        empty_sessions,
         status
     )
 
@@ -196,35 +273,41 @@ def build_ui():
                     send_button = gr.Button("➤", elem_id="send-btn", scale=0, min_width=48, variant="secondary")
                 status = gr.Markdown("")
         choices_state = gr.State([])
+        # Sessions created in this UI that have no messages yet
+        empty_sessions_state = gr.State([])
 
         # Init dropdown & clear UI on load
-        ui.load(init_sessions, outputs=[session_dropdown, choices_state, chat, status])
+        ui.load(init_sessions, outputs=[session_dropdown, choices_state, empty_sessions_state, chat, status])
 
-        session_dropdown.change(handle_session_change, inputs=[session_dropdown, chat], outputs=[chat, status])
+        session_dropdown.change(
+            handle_session_change,
+            inputs=[session_dropdown, chat, empty_sessions_state],
+            outputs=[chat, status]
+        )
 
         new_session_button.click(
             fn=handle_new_chat_click,
-            inputs=[choices_state],
-            outputs=[session_dropdown, choices_state, chat, status]
+            inputs=[choices_state, empty_sessions_state],
+            outputs=[session_dropdown, choices_state, empty_sessions_state, chat, status]
         )
 
         send_button.click(
             handle_message_send,
-            inputs=[session_dropdown, message_input, chat],
-            outputs=[chat],
+            inputs=[session_dropdown, message_input, chat, empty_sessions_state],
+            outputs=[chat, empty_sessions_state],
         )
 
         # When user press Enter
         message_input.submit(
             handle_message_send,
-            inputs=[session_dropdown, message_input, chat],
-            outputs=[chat],
+            inputs=[session_dropdown, message_input, chat, empty_sessions_state],
+            outputs=[chat, empty_sessions_state],
         )
 
         delete_session_button.click(
             fn=handle_session_deletion,
-            inputs=[session_dropdown, choices_state],
-            outputs=[chat, session_dropdown, choices_state, status]
+            inputs=[session_dropdown, choices_state, empty_sessions_state],
+            outputs=[chat, session_dropdown, choices_state, empty_sessions_state, status]
         )
 
     return ui
@@ -232,4 +315,11 @@ def build_ui():
 
 if __name__ == "__main__":
     ui = build_ui()
-    ui.launch(server_name="0.0.0.0", server_port=int(os.getenv("PORT", 7860)), show_api=False)
+    # Let several users' chats stream at the same time instead of one after another
+    ui.queue(default_concurrency_limit=32, max_size=100)
+    ui.launch(
+        server_name="0.0.0.0",
+        server_port=int(os.getenv("PORT", 7860)),
+        show_api=False,
+        app_kwargs={"lifespan": lifespan},
+    )
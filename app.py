@@ -1,25 +1,32 @@
 import os
 import asyncio
 import sys
+import time
 import uuid
+from collections import OrderedDict
+from functools import lru_cache
 from typing import List, Dict
 import logging
+import operator
+
+import httpx
+import orjson
 
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, MessagesPlaceholder, HumanMessagePromptTemplate
+from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder, HumanMessagePromptTemplate
 from langchain_community.chat_message_histories import SQLChatMessageHistory
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages import SystemMessage
 
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from pydantic import BaseModel
 import uvicorn
 from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy import MetaData, Table, Column, String, DateTime, text, select, insert, delete
+from sqlalchemy import event, MetaData, Table, Column, Integer, String, Text, DateTime, text, select, insert, delete
 
 load_dotenv()
 
@@ -27,13 +34,33 @@ logger = logging.getLogger("uvicorn.error")
 
 MODEL = os.getenv("OPENAI_MODEL", "gpt-5-nano")
 DB_URL = os.getenv("DB_URL")
-async_engine = create_async_engine(DB_URL)
+WORKERS = int(os.getenv("WORKERS", 1))
+IS_SQLITE = DB_URL.startswith("sqlite")
+async_engine = create_async_engine(DB_URL, connect_args={"timeout": 30} if IS_SQLITE else {})
+
+# WAL lets history reads proceed while a chat is appending messages.
+# The other pragmas are per-connection, so apply them to every new connection.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+)
+
+if IS_SQLITE:
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+        cursor.close()
 
 SYSTEM_PROMPT = "You are a helpful assistant that answers questions from the user."
 
 PROMPT = ChatPromptTemplate.from_messages(
     [
-        SystemMessagePromptTemplate.from_template("{system_prompt}"),
+        # The system prompt is constant, so embed it as a ready-made message rather than a template
+        SystemMessage(content=SYSTEM_PROMPT),
         MessagesPlaceholder(variable_name="history"),
         HumanMessagePromptTemplate.from_template("{input}"),
     ]
@@ -47,6 +74,45 @@ chat_sessions = Table(
     Column("created_at", DateTime, server_default=text("(DATETIME('now'))")),
 )
 
+# Mirrors the default table used by SQLChatMessageHistory so history can be read with one query
+message_store = Table(
+    "message_store",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("session_id", Text),
+    Column("message", Text),
+)
+
+_get_content = operator.attrgetter("content")
+
+# Stored message types (as written by messages_to_dict) -> API roles.
+# Streamed replies are saved as chunk types, so those map to the same roles.
+MESSAGE_ROLES = {
+    "ai": "assistant",
+    "AIMessageChunk": "assistant",
+    "human": "user",
+    "HumanMessageChunk": "user",
+    "system": "system",
+    "SystemMessageChunk": "system",
+}
+
+HEALTH_BYTES = orjson.dumps({"status": "ok"})
+
+# Ask clients and reverse proxies (e.g. nginx) to pass streamed tokens through unbuffered
+STREAM_HEADERS = {"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+
+# Short-lived cache for /sessions; bumping the version on create/delete invalidates it.
+# The version only lives in this process, so with several workers the cache is
+# disabled (a zero TTL never hits) rather than serving other workers' stale lists.
+SESSIONS_TTL = 1.0 if WORKERS == 1 else 0.0
+_sessions_version = 0
+_sessions_cache = {"version": -1, "expiry": 0.0, "body": b""}
+
+
+def invalidate_sessions_cache():
+    global _sessions_version
+    _sessions_version += 1
+
 
 class ChatIn(BaseModel):
     session_id: str = "1"
@@ -58,20 +124,58 @@ class HistoryOut(BaseModel):
     messages: List[Dict[str, str]]
 
 
+# LRU cache of message histories so repeat requests skip re-creating the history object
+HISTORY_CACHE_SIZE = 1024
+HISTORY_CACHE: "OrderedDict[str, SQLChatMessageHistory]" = OrderedDict()
+
+
+def _history(session_id: str) -> SQLChatMessageHistory:
+    history = HISTORY_CACHE.get(session_id)
+    if history is None:
+        history = SQLChatMessageHistory(session_id=session_id, connection=async_engine)
+        HISTORY_CACHE[session_id] = history
+        if len(HISTORY_CACHE) > HISTORY_CACHE_SIZE:
+            HISTORY_CACHE.popitem(last=False)
+    else:
+        HISTORY_CACHE.move_to_end(session_id)
+    return history
+
+
+# Shared HTTP client so every /chat reuses keep-alive connections to the LLM provider
+LLM_HTTP_CLIENT = httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=50))
+
+
+@lru_cache(maxsize=1)
 def build_chain():
-    llm = ChatOpenAI(model=MODEL, temperature=0.7, streaming=True)
+    llm = ChatOpenAI(model=MODEL, temperature=0.7, streaming=True, http_async_client=LLM_HTTP_CLIENT)
     return PROMPT | llm
 
 
+@lru_cache(maxsize=1)
+def build_chain_with_history():
+    # Built lazily on the first /chat so importing the app does not require provider credentials
+    return RunnableWithMessageHistory(
+        build_chain(),
+        _history,
+        input_messages_key="input",
+        history_messages_key="history",
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with async_engine.begin() as conn:
         await conn.run_sync(metadata.create_all)
+        # Also applies to databases whose message_store predates this index
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_message_store_session_id ON message_store (session_id)"
+        ))
     yield
+    await LLM_HTTP_CLIENT.aclose()
     await async_engine.dispose()
 
 
-app = FastAPI(title="LLM Chat", lifespan=lifespan)
+app = FastAPI(title="LLM Chat", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -87,7 +191,7 @@ app.add_middleware(
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return Response(content=HEALTH_BYTES, media_type="application/json")
 
 
 @app.post("/session")
@@ -95,34 +199,42 @@ async def create_new_session():
     new_session_id = str(uuid.uuid4())
     async with async_engine.begin() as conn:
         await conn.execute(insert(chat_sessions).values(session_id=new_session_id))
+    invalidate_sessions_cache()
     return {"session_id": new_session_id}
 
 
 @app.get("/sessions")
 async def list_all_sessions():
+    cached = _sessions_cache
+    if cached["version"] == _sessions_version and time.monotonic() < cached["expiry"]:
+        return Response(content=cached["body"], media_type="application/json")
+
+    version = _sessions_version
     async with async_engine.connect() as conn:
         session_list = (await conn.execute(select(chat_sessions.c.session_id))).scalars().all()
-    return {"sessions": session_list}
+    body = orjson.dumps({"sessions": session_list})
+    _sessions_cache.update(version=version, expiry=time.monotonic() + SESSIONS_TTL, body=body)
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/session/{session_id}/history", response_model=HistoryOut)
 async def get_history(session_id):
-    history = SQLChatMessageHistory(session_id=session_id, connection=async_engine)
+    query = (
+        select(message_store.c.message)
+        .where(message_store.c.session_id == session_id)
+        .order_by(message_store.c.id)
+    )
+    async with async_engine.connect() as conn:
+        rows = (await conn.execute(query)).scalars().all()
 
-    messages_raw = await history.aget_messages()
+    # Map the stored JSON straight to role/content dicts, skipping LangChain message objects
     msgs = []
-    for m in messages_raw:
-        if isinstance(m, AIMessage):
-            role = "assistant"
-        elif isinstance(m, HumanMessage):
-            role = "user"
-        elif isinstance(m, SystemMessage):
-            role = "system"
-        else:
-            role = "unknown"
-        msgs.append({"role": role, "content": m.content})
+    for raw in rows:
+        m = orjson.loads(raw)
+        msgs.append({"role": MESSAGE_ROLES.get(m["type"], "unknown"), "content": m["data"]["content"]})
 
-    return HistoryOut(session_id=session_id, messages=msgs)
+    # Returning the response directly skips re-validating every message against HistoryOut
+    return ORJSONResponse({"session_id": session_id, "messages": msgs})
 
 
 @app.post("/chat")
@@ -133,9 +245,7 @@ async def chat(body: ChatIn):
     if not user_msg:
         raise HTTPException(status_code=400, detail="user_message cannot be empty.")
 
-    chain = build_chain()
     inputs = {
-        "system_prompt": SYSTEM_PROMPT,
         "input": user_msg,
     }
 
@@ -143,40 +253,56 @@ async def chat(body: ChatIn):
         "configurable": {"session_id": sid}
     }
 
-    chain_with_history = RunnableWithMessageHistory(
-        chain,
-        lambda session_id: SQLChatMessageHistory(
-            session_id=session_id, connection=async_engine,
-        ),
-        input_messages_key="input",
-        history_messages_key="history",
-    )
+    chain_with_history = build_chain_with_history()
 
     async def gen():
         try:
             stream = chain_with_history.astream(inputs, config=config)
+            first = await anext(stream, None)
+            if first is None:
+                return
+
+            # Every chunk in a stream has the same type, so pick the text accessor once
+            get_text = str if isinstance(first, str) else _get_content
+            s = get_text(first)
+            if s:
+                yield s.encode("utf-8")
+
             async for chunk in stream:
-                s = chunk if isinstance(chunk, str) else getattr(chunk, "content", "")
+                s = get_text(chunk)
                 if not s:
                     continue
-                yield s
+                yield s.encode("utf-8")
+                # Let other requests run even when the provider delivers chunks back-to-back
+                await asyncio.sleep(0)
         except Exception as e:
             logger.exception("Streaming failed: %s", e)
-            yield f"\n\n[ERROR] Provider failed: {type(e).__name__}: {e}"
+            yield f"\n\n[ERROR] Provider failed: {type(e).__name__}: {e}".encode("utf-8")
 
-    return StreamingResponse(gen(), media_type="text/plain")
+    return StreamingResponse(gen(), media_type="text/plain", headers=STREAM_HEADERS)
 
 
 @app.delete("/session/{session_id}")
 async def clear_session_history(session_id: str):
-    history = SQLChatMessageHistory(session_id=session_id, connection=async_engine)
+    history = HISTORY_CACHE.pop(session_id, None) or SQLChatMessageHistory(session_id=session_id, connection=async_engine)
     await history.aclear()
     async with async_engine.begin() as conn:
         await conn.execute(delete(chat_sessions).where(chat_sessions.c.session_id == session_id))
+    invalidate_sessions_cache()
     return {"status": "cleared", "session_id": session_id}
 
 
 if __name__ == "__main__":
     if sys.platform.startswith("win"):
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+        loop = "asyncio"  # uvloop is not available on Windows
+    else:
+        loop = "uvloop"
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8000,
+        loop=loop,
+        http="httptools",
+        workers=WORKERS,
+    )
@@ -13,19 +13,23 @@ if ROOT not in sys.path:
 
 
 @pytest.fixture(scope="session", autouse=True)
-def set_test_env():
-    # use a dedicated db file just for testing
-    tmp_db = os.path.abspath("tests/test_chat.db")
+def set_test_env(tmp_path_factory):
+    # use a throwaway db file so test runs never touch a tracked file
+    tmp_db = tmp_path_factory.mktemp("db") / "test_chat.db"
     os.environ["DB_URL"] = f"sqlite+aiosqlite:///{tmp_db}"
     os.environ.setdefault("OPENAI_MODEL", "gpt-4o-mini")
 
-    yield
-
-@pytest.fixture
-async def client(set_test_env):
+    # load the app once per test run so the engine is only created once
     import app
     importlib.reload(app)
 
+    yield app
+
+# one app startup for the whole run; tests use fresh session ids so they stay isolated
+@pytest.fixture(scope="session")
+async def client(set_test_env):
+    app = set_test_env
+
     # create tables
     if hasattr(app, "metadata"):
         async with app.async_engine.begin() as conn:
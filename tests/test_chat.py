@@ -1,6 +1,7 @@
 import asyncio
+from functools import lru_cache
 import pytest
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
 
 # Basic mock that simulates a streaming LLM chain
 class FakeStreamChain:
@@ -15,23 +16,6 @@ class FakeStreamChain:
             await asyncio.sleep(0)
             yield chunk
 
-# Fake SQL history
-class FakeSQLChatMessageHistory:
-    _STORE = {}
-
-    def __init__(self, session_id=None, connection=None):
-        self._sid = session_id or "default"
-        FakeSQLChatMessageHistory._STORE.setdefault(self._sid, [])
-
-    async def aget_messages(self):
-        return list(FakeSQLChatMessageHistory._STORE.get(self._sid, []))
-
-    async def aadd_message(self, message):
-        FakeSQLChatMessageHistory._STORE[self._sid].append(message)
-
-    async def aclear(self):
-        FakeSQLChatMessageHistory._STORE[self._sid].clear()
-
 # Mock how RunnableWithMessageHistory works (simplified)
 class FakeHistoryWrapper:
     def __init__(self, underlying, history_factory, **kwargs):
@@ -65,7 +49,12 @@ async def test_chat(client, monkeypatch):
     import app as backend
 
     monkeypatch.setattr(backend, "build_chain", lambda: FakeStreamChain())
-    monkeypatch.setattr(backend, "SQLChatMessageHistory", FakeSQLChatMessageHistory)
+    # the app is shared across tests, so keep the fake chain out of the real memoised builder
+    monkeypatch.setattr(
+        backend,
+        "build_chain_with_history",
+        lru_cache(maxsize=1)(backend.build_chain_with_history.__wrapped__),
+    )
     monkeypatch.setattr(
         backend,
         "RunnableWithMessageHistory",
@@ -81,6 +70,7 @@ async def test_chat(client, monkeypatch):
     payload = {"session_id": session_id, "user_message": "test message"}
     async with client.stream("POST", "/chat", json=payload) as resp:
         assert resp.status_code == 200
+        assert resp.headers["x-accel-buffering"] == "no"
         full_response = ""
         async for chunk in resp.aiter_bytes():
             full_response += chunk.decode("utf-8", errors="ignore")
@@ -92,3 +82,22 @@ async def test_chat(client, monkeypatch):
     assert r.status_code == 200
     roles = [m["role"] for m in r.json()["messages"]]
     assert "user" in roles and "assistant" in roles
+
+
+@pytest.mark.asyncio
+async def test_history_maps_streamed_reply_to_assistant(client):
+    import app as backend
+
+    response = await client.post("/session")
+    session_id = response.json()["session_id"]
+
+    # RunnableWithMessageHistory saves a streamed reply as an aggregated AIMessageChunk
+    history = backend._history(session_id)
+    await history.aadd_messages([HumanMessage(content="hi"), AIMessageChunk(content="hello")])
+
+    r = await client.get(f"/session/{session_id}/history")
+    assert r.status_code == 200
+    assert r.json()["messages"] == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
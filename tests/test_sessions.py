@@ -22,3 +22,18 @@ async def test_clear_session(client):
     response = await client.delete(f"/session/{sid}")
     assert response.status_code == 200
     assert response.json()["status"] == "cleared"
+
+
+@pytest.mark.asyncio
+async def test_list_sessions_reflects_create_and_delete(client):
+    await client.get("/sessions")
+    response = await client.post("/session")
+    sid = response.json()["session_id"]
+
+    response = await client.get("/sessions")
+    assert response.status_code == 200
+    assert sid in response.json()["sessions"]
+
+    await client.delete(f"/session/{sid}")
+    response = await client.get("/sessions")
+    assert sid not in response.json()["sessions"]
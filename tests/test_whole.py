@@ -1,19 +1,29 @@
+import pytest
 import requests
+from requests.adapters import HTTPAdapter
 
 BASE_URL = "http://localhost:8000"
 
 
-def test_end_to_end_health():
-    response = requests.get(f"{BASE_URL}/health")
+# Share one pooled session so the end-to-end calls reuse keep-alive connections
+@pytest.fixture(scope="session")
+def http_session():
+    with requests.Session() as session:
+        session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=10))
+        yield session
+
+
+def test_end_to_end_health(http_session):
+    response = http_session.get(f"{BASE_URL}/health")
     assert response.status_code == 200
     assert response.json()["status"] == "ok"
 
 
-def test_end_to_end_session_and_chat():
-    response = requests.post(f"{BASE_URL}/session")
+def test_end_to_end_session_and_chat(http_session):
+    response = http_session.post(f"{BASE_URL}/session")
     sid = response.json()["session_id"]
 
-    response = requests.post(f"{BASE_URL}/chat", json={
+    response = http_session.post(f"{BASE_URL}/chat", json={
         "session_id": sid, "user_message": "Hello"
     })
     assert response.status_code == 200